@@ -0,0 +1,121 @@
+# distutils: language = c++
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Native BPE merge loop for gpt.tokenizer.Tokenizer.
+
+Optional: the tokenizer falls back to its pure-Python PythonMergeTable when this
+module is not built. Build it in place with
+
+    cythonize -i gpt/_bpe_ext.pyx
+"""
+from cython.operator cimport dereference as deref
+from libc.stdint cimport int32_t, int64_t, uint64_t
+from libcpp cimport bool
+from libcpp.pair cimport pair
+from libcpp.queue cimport priority_queue
+from libcpp.unordered_map cimport unordered_map
+from libcpp.vector cimport vector
+
+
+cdef inline uint64_t _pair_key(int64_t left, int64_t right) noexcept nogil:
+    return (<uint64_t>left << 32) | <uint64_t>right
+
+
+ctypedef unordered_map[uint64_t, pair[int32_t, int32_t]] merge_map
+
+
+cdef inline int32_t deref_rank(merge_map.iterator it) noexcept nogil:
+    return deref(it).second.first
+
+
+cdef inline int32_t deref_new_id(merge_map.iterator it) noexcept nogil:
+    return deref(it).second.second
+
+
+cdef class MergeTable:
+    """
+    Merge table keyed by (left_id << 32) | right_id, holding (rank, new_id).
+    """
+    cdef merge_map table
+
+    def __init__(self, merges_by_left: dict[int, dict[int, tuple[int, int]]]):
+        """
+        merges_by_left maps left_id -> {right_id: (rank, new_id)}, as built by Tokenizer.
+        """
+        for left, right_merges in merges_by_left.items():
+            for right, (rank, new_id) in right_merges.items():
+                self.table[_pair_key(left, right)] = pair[int32_t, int32_t](rank, new_id)
+
+    def merge_word(self, vector[int64_t] ids) -> list[int]:
+        """
+        Same algorithm as PythonMergeTable.merge_word, with the GIL released.
+        """
+        with nogil:
+            self._merge(ids)
+        return ids
+
+    cdef void _merge(self, vector[int64_t]& tokens) noexcept nogil:
+        cdef Py_ssize_t n = tokens.size()
+        if n < 2:
+            return
+
+        cdef vector[Py_ssize_t] prev = vector[Py_ssize_t](n)
+        cdef vector[Py_ssize_t] next_ = vector[Py_ssize_t](n)
+        cdef vector[bool] alive = vector[bool](n, True)
+        # std::priority_queue is a max-heap, so push negated (rank, position)
+        cdef priority_queue[pair[int32_t, Py_ssize_t]] heap
+        cdef merge_map.iterator it
+        cdef merge_map.iterator end = self.table.end()
+        cdef Py_ssize_t i, left, right
+        cdef int32_t rank
+        cdef pair[int32_t, Py_ssize_t] top
+
+        for i in range(n):
+            prev[i] = i - 1
+            next_[i] = i + 1
+        next_[n - 1] = -1
+
+        for i in range(n - 1):
+            it = self.table.find(_pair_key(tokens[i], tokens[i + 1]))
+            if it != end:
+                heap.push(pair[int32_t, Py_ssize_t](-deref_rank(it), -i))
+
+        while not heap.empty():
+            top = heap.top()
+            heap.pop()
+            rank = -top.first
+            left = -top.second
+            # skip stale entries whose slots were merged away or changed
+            if not alive[left]:
+                continue
+            right = next_[left]
+            if right == -1:
+                continue
+            it = self.table.find(_pair_key(tokens[left], tokens[right]))
+            if it == end or deref_rank(it) != rank:
+                continue
+
+            tokens[left] = deref_new_id(it)
+            alive[right] = False
+            next_[left] = next_[right]
+            if next_[left] != -1:
+                prev[next_[left]] = left
+
+            if prev[left] != -1:
+                it = self.table.find(_pair_key(tokens[prev[left]], tokens[left]))
+                if it != end:
+                    heap.push(pair[int32_t, Py_ssize_t](-deref_rank(it), -prev[left]))
+            if next_[left] != -1:
+                it = self.table.find(_pair_key(tokens[left], tokens[next_[left]]))
+                if it != end:
+                    heap.push(pair[int32_t, Py_ssize_t](-deref_rank(it), -left))
+
+        # compact the surviving slots in list order
+        i = 0
+        n = 0
+        while i != -1:
+            tokens[n] = tokens[i]
+            n += 1
+            i = next_[i]
+        tokens.resize(n)
+
@@ -19,6 +19,8 @@ import pstats
 logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
 PRETOKENIZE_REGEX = r"""'(?:[sdmt]|ll|ve|re)| ?\p{L}+| ?\p{N}+| ?[^\s\p{L}\p{N}]+|\s+(?!\S)|\s+"""
 DEFAULT_NUM_TOKENS = 256
+# one shared 1-byte object per byte value, so splitting pretokens into bytes doesn't allocate
+BYTE_SINGLETONS: tuple[bytes, ...] = tuple(bytes([b]) for b in range(256))
 
 
 
@@ -297,7 +299,7 @@ def process_chunk(input_path: str, start: int, end: int, special_tokens: list[st
                 encoding_start = time.time()
               
                 for pretoken, count in pretokenized.items():
-                    key = tuple(bytes([b]) for b in pretoken.encode("utf-8"))
+                    key = tuple([BYTE_SINGLETONS[b] for b in pretoken.encode("utf-8")])
                     freq_table[key] += count
                 stats['encoding_time'].append(time.time() - encoding_start)
         #logger.info(f"Finished process_chunk: {start} to {end}")
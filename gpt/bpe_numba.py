@@ -0,0 +1,198 @@
+"""
+Numba-compiled BPE merge loop for gpt.tokenizer.Tokenizer.
+
+Used when numba is installed and the Cython extension (_bpe_ext.pyx) is not built.
+The kernels are compiled with cache=True: the first Tokenizer built without a warm
+numba cache pays several seconds of JIT compilation; later processes load it from disk.
+The merge table is a flat open-addressing hash table over packed
+(left_id << 32) | right_id keys, so the jitted kernel only touches NumPy arrays.
+"""
+import numpy as np
+from numba import njit
+
+EMPTY_KEY = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+
+@njit(cache=True)
+def splitmix64(x):
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+@njit(cache=True)
+def pair_key(left, right):
+    return (np.uint64(left) << np.uint64(32)) | np.uint64(right)
+
+
+@njit(cache=True)
+def find_slot(table_keys, table_mask, key):
+    """
+    Returns the slot holding key, or the empty slot where it would be inserted.
+    """
+    slot = splitmix64(key) & table_mask
+    while table_keys[slot] != key and table_keys[slot] != EMPTY_KEY:
+        slot = (slot + np.uint64(1)) & table_mask
+    return slot
+
+
+@njit(cache=True)
+def fill_table(table_keys, table_rank, table_new, table_mask, lefts, rights, ranks, new_ids):
+    for i in range(lefts.shape[0]):
+        key = pair_key(lefts[i], rights[i])
+        slot = find_slot(table_keys, table_mask, key)
+        table_keys[slot] = key
+        table_rank[slot] = ranks[i]
+        table_new[slot] = new_ids[i]
+
+
+@njit(cache=True)
+def lookup_slot(table_keys, table_mask, left, right):
+    """
+    Returns the slot of the (left, right) merge, or -1 when there is none.
+    """
+    key = pair_key(left, right)
+    slot = find_slot(table_keys, table_mask, key)
+    if table_keys[slot] == EMPTY_KEY:
+        return -1
+    return np.int64(slot)
+
+
+@njit(cache=True)
+def heap_push(heap, size, item):
+    heap[size] = item
+    i = size
+    while i > 0:
+        parent = (i - 1) >> 1
+        if heap[parent] <= heap[i]:
+            break
+        heap[parent], heap[i] = heap[i], heap[parent]
+        i = parent
+    return size + 1
+
+
+@njit(cache=True)
+def heap_pop(heap, size):
+    top = heap[0]
+    size -= 1
+    heap[0] = heap[size]
+    i = 0
+    while True:
+        smallest = i
+        left = 2 * i + 1
+        right = left + 1
+        if left < size and heap[left] < heap[smallest]:
+            smallest = left
+        if right < size and heap[right] < heap[smallest]:
+            smallest = right
+        if smallest == i:
+            break
+        heap[smallest], heap[i] = heap[i], heap[smallest]
+        i = smallest
+    return top, size
+
+
+@njit(cache=True, nogil=True)
+def merge_word_nb(ids, table_keys, table_rank, table_new, table_mask):
+    """
+    Same algorithm as PythonMergeTable.merge_word: a linked list of token slots and a
+    min-heap of (rank << 32) | left_position entries.
+    """
+    n = ids.shape[0]
+    tokens = ids.copy()
+    if n < 2:
+        return tokens
+
+    prev = np.arange(-1, n - 1)
+    next_ = np.arange(1, n + 1)
+    next_[n - 1] = -1
+    alive = np.ones(n, dtype=np.bool_)
+    # at most n - 1 initial pairs plus two new pairs per merge
+    heap = np.empty(3 * n, dtype=np.int64)
+    size = 0
+
+    for i in range(n - 1):
+        slot = lookup_slot(table_keys, table_mask, tokens[i], tokens[i + 1])
+        if slot != -1:
+            size = heap_push(heap, size, (np.int64(table_rank[slot]) << 32) | i)
+
+    while size > 0:
+        item, size = heap_pop(heap, size)
+        rank = item >> 32
+        left = item & 0xFFFFFFFF
+        # skip stale entries whose slots were merged away or changed
+        if not alive[left]:
+            continue
+        right = next_[left]
+        if right == -1:
+            continue
+        slot = lookup_slot(table_keys, table_mask, tokens[left], tokens[right])
+        if slot == -1 or table_rank[slot] != rank:
+            continue
+
+        tokens[left] = table_new[slot]
+        alive[right] = False
+        next_[left] = next_[right]
+        if next_[left] != -1:
+            prev[next_[left]] = left
+
+        if prev[left] != -1:
+            slot = lookup_slot(table_keys, table_mask, tokens[prev[left]], tokens[left])
+            if slot != -1:
+                size = heap_push(heap, size, (np.int64(table_rank[slot]) << 32) | prev[left])
+        if next_[left] != -1:
+            slot = lookup_slot(table_keys, table_mask, tokens[left], tokens[next_[left]])
+            if slot != -1:
+                size = heap_push(heap, size, (np.int64(table_rank[slot]) << 32) | left)
+
+    out = np.empty(n, dtype=np.int64)
+    count = 0
+    i = 0
+    while i != -1:
+        out[count] = tokens[i]
+        count += 1
+        i = next_[i]
+    return out[:count]
+
+
+class NumbaMergeTable:
+    """
+    Open-addressing merge table with the same merge_word interface as _bpe_ext.MergeTable.
+    """
+
+    def __init__(self, merges_by_left: dict[int, dict[int, tuple[int, int]]]):
+        """
+        merges_by_left maps left_id -> {right_id: (rank, new_id)}, as built by Tokenizer.
+        """
+        merges = [
+            (left, right, rank, new_id)
+            for left, right_merges in merges_by_left.items()
+            for right, (rank, new_id) in right_merges.items()
+        ]
+        # keep the load factor at or below 1/2 so probe chains stay short
+        capacity = 1
+        while capacity < 2 * max(len(merges), 1):
+            capacity *= 2
+        self.table_mask = np.uint64(capacity - 1)
+        self.table_keys = np.full(capacity, EMPTY_KEY, dtype=np.uint64)
+        self.table_rank = np.zeros(capacity, dtype=np.int32)
+        self.table_new = np.zeros(capacity, dtype=np.int64)
+
+        fill_table(
+            self.table_keys,
+            self.table_rank,
+            self.table_new,
+            self.table_mask,
+            np.array([merge[0] for merge in merges], dtype=np.int64),
+            np.array([merge[1] for merge in merges], dtype=np.int64),
+            np.array([merge[2] for merge in merges], dtype=np.int32),
+            np.array([merge[3] for merge in merges], dtype=np.int64),
+        )
+        # pay the JIT compilation cost at construction rather than on the first encode
+        self.merge_word([0, 0])
+
+    def merge_word(self, ids: list[int]) -> list[int]:
+        return merge_word_nb(
+            np.array(ids, dtype=np.int64), self.table_keys, self.table_rank, self.table_new, self.table_mask
+        ).tolist()
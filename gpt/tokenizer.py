@@ -1,9 +1,34 @@
+import heapq
 import json
-from typing import Iterable
-from functools import lru_cache
+import threading
+from array import array
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import re as stdlib_re
+from typing import Callable, Iterable, Iterator
+from functools import lru_cache, partial
 import regex as re
 
-from .bpe import PRETOKENIZE_REGEX
+from .bpe import BYTE_SINGLETONS, PRETOKENIZE_REGEX
+
+# Merge loop backends, in order of preference; Tokenizer(merge_backend=...) picks one,
+# otherwise the first available is used:
+#   1. "cython": the extension _bpe_ext.MergeTable, if it has been built;
+#   2. "numba": bpe_numba.NumbaMergeTable, if numba is installed. Its JIT compiles on the
+#      first Tokenizer construction (several seconds) unless numba's on-disk cache is warm;
+#   3. "python": the pure-Python PythonMergeTable.
+# All three produce identical ids; tests/test_gpt_tokenizer.py checks them against tiktoken.
+MERGE_BACKENDS = ("cython", "numba", "python")
+PRETOKENIZE_RE = re.compile(PRETOKENIZE_REGEX)
+# PRETOKENIZE_REGEX restricted to ASCII, where \p{L} is [A-Za-z], \p{N} is [0-9] and \s
+# is [ \t\n\r\f\v]; the stdlib engine runs it about twice as fast as `regex` runs the
+# general pattern, so pretokenize uses it for chunks that are pure ASCII
+PRETOKENIZE_ASCII_RE = stdlib_re.compile(
+    r"""'(?:[sdmt]|ll|ve|re)| ?[A-Za-z]+| ?[0-9]+| ?[^\sA-Za-z0-9]+|\s+(?!\S)|\s+""", stdlib_re.ASCII
+)
+PRETOKEN_CACHE_SIZE = 2**15
+ENCODE_BATCH_SIZE = 1024
 
 @lru_cache
 def gpt2_bytes_to_unicode() -> dict[int, str]:
@@ -53,11 +78,157 @@ def gpt2_bytes_to_unicode() -> dict[int, str]:
     return d
 
 
-def get_pairs(pretoken: list[bytes]) -> list[tuple[bytes, bytes]]:
+@lru_cache
+def gpt2_unicode_to_bytes_table() -> dict[int, int]:
+    """
+    Inverse of `gpt2_bytes_to_unicode` as a `str.translate` table: maps the code point
+    of each printable stand-in character back to its byte value, so that
+    `token.translate(table).encode("latin-1")` recovers the raw bytes of a token
+    in two C-level passes instead of one dict lookup per character.
+    """
+    return {ord(character): b for b, character in gpt2_bytes_to_unicode().items()}
+
+
+def check_gpt2_unicode(tokens: Iterable[str]) -> None:
     """
-    Returns all pairs of bytes in the pretoken.
+    Raises KeyError for the first character in `tokens` that is not one of the
+    stand-ins of `gpt2_bytes_to_unicode`. `str.translate` leaves such characters
+    untouched, so serialized vocabularies and merges are checked once per file
+    before they are translated.
     """
-    return [(pretoken[i], pretoken[i + 1]) for i in range(len(pretoken) - 1)]
+    stand_ins = frozenset(gpt2_bytes_to_unicode().values())
+    for token in tokens:
+        if not stand_ins.issuperset(token):
+            raise KeyError(next(character for character in token if character not in stand_ins))
+
+
+def _encode_pretoken(
+    special_token_ids: dict[bytes, int],
+    byte_ids: list[int | None],
+    merge_word: Callable[[list[int]], list[int]],
+    word_bytes: bytes,
+) -> tuple[int, ...]:
+    """
+    Encodes a single pretoken into ids; wrapped with a per-thread LRU cache by
+    Tokenizer._thread_encode_pretoken. Special tokens never reach this point as
+    anything but themselves, since the text is split on them before pretokenization.
+    """
+    special_token_id = special_token_ids.get(word_bytes)
+    if special_token_id is not None:
+        return (special_token_id,)
+    word = [byte_ids[b] for b in word_bytes]
+    if None in word:
+        raise KeyError(BYTE_SINGLETONS[word_bytes[word.index(None)]])
+    return tuple(merge_word(word))
+
+
+class PythonMergeTable:
+    """
+    Pure-Python merge loop with the same merge_word interface as _bpe_ext.MergeTable.
+    """
+
+    def __init__(self, merges_by_left: dict[int, dict[int, tuple[int, int]]]):
+        """
+        merges_by_left maps left_id -> {right_id: (rank, new_id)}, as built by Tokenizer.
+        """
+        self.merges_by_left = merges_by_left
+
+    def merge_word(self, word: list[int]) -> list[int]:
+        """
+        Merges the word, given as the ids of its single-byte tokens, into vocabulary
+        tokens (no merges across pre-token boundaries)
+        Apply merges to our pre-tokens in the same order of creation.
+
+        The tokens are kept in a doubly-linked list and the candidate pairs in a
+        min-heap keyed on (merge rank, left position), so each merge costs
+        O(log n) instead of a full rescan of the word.
+        """
+        n = len(word)
+        if n < 2:
+            return word[:]
+
+        merges_by_left = self.merges_by_left
+        no_merges = {}
+        tokens = word[:]
+        prev = list(range(-1, n - 1))
+        next_ = list(range(1, n + 1))
+        next_[-1] = -1
+        alive = [True] * n
+
+        # heap entries are (rank, left position, new id); ranks identify their pair
+        heap = []
+        for i in range(n - 1):
+            right_merges = merges_by_left.get(tokens[i])
+            if right_merges is not None:
+                merge = right_merges.get(tokens[i + 1])
+                if merge is not None:
+                    heap.append((merge[0], i, merge[1]))
+        heapq.heapify(heap)
+
+        while heap:
+            rank, left, new_id = heapq.heappop(heap)
+            # skip stale entries whose slots were merged away or changed
+            if not alive[left]:
+                continue
+            right = next_[left]
+            if right == -1:
+                continue
+            merge = merges_by_left.get(tokens[left], no_merges).get(tokens[right])
+            if merge is None or merge[0] != rank:
+                continue
+
+            tokens[left] = new_id
+            alive[right] = False
+            next_[left] = next_[right]
+            if next_[left] != -1:
+                prev[next_[left]] = left
+
+            right_merges = merges_by_left.get(new_id)
+            if prev[left] != -1:
+                merge = merges_by_left.get(tokens[prev[left]], no_merges).get(new_id)
+                if merge is not None:
+                    heapq.heappush(heap, (merge[0], prev[left], merge[1]))
+            if next_[left] != -1 and right_merges is not None:
+                merge = right_merges.get(tokens[next_[left]])
+                if merge is not None:
+                    heapq.heappush(heap, (merge[0], left, merge[1]))
+
+        ids = []
+        i = 0
+        while i != -1:
+            ids.append(tokens[i])
+            i = next_[i]
+        return ids
+
+
+def load_merge_backend(name: str) -> type:
+    """
+    Returns the merge table class of the named backend. Raises ValueError for an
+    unknown name and ImportError if the backend is not available in this environment.
+    """
+    if name == "cython":
+        from ._bpe_ext import MergeTable
+        return MergeTable
+    if name == "numba":
+        from .bpe_numba import NumbaMergeTable
+        return NumbaMergeTable
+    if name == "python":
+        return PythonMergeTable
+    raise ValueError(f"unknown merge backend {name!r}, expected one of {MERGE_BACKENDS}")
+
+
+@lru_cache
+def default_merge_backend() -> str:
+    """
+    Returns the name of the first merge backend in MERGE_BACKENDS that is available.
+    """
+    for name in MERGE_BACKENDS:
+        try:
+            load_merge_backend(name)
+        except ImportError:  # the native merge loops are optional
+            continue
+        return name
+    return "python"
 
 
 class Tokenizer:
@@ -70,7 +241,8 @@ class Tokenizer:
         self, 
         vocab: dict[int, bytes], 
         merges: list[tuple[bytes, bytes]], 
-        special_tokens: list[str]
+        special_tokens: list[str],
+        merge_backend: str | None = None,
     ):
         
         self.vocab: dict[int, bytes] = vocab
@@ -79,30 +251,80 @@ class Tokenizer:
         
         # add user-specified special tokens to the vocab
         if special_tokens:
+            existing_tokens = set(vocab.values())
             for special_token in special_tokens:
                 byte_encoded_special_token = special_token.encode("utf-8")
-                if byte_encoded_special_token not in set(vocab.values()):
+                if byte_encoded_special_token not in existing_tokens:
                     vocab[len(vocab)] = byte_encoded_special_token
+                    existing_tokens.add(byte_encoded_special_token)
             # Sort special tokens by length in descending order to handle overlapping tokens correctly
             sorted_special_tokens = sorted(special_tokens, key=len, reverse=True)
             self.split_pattern = "(" + "|".join(map(re.escape, sorted_special_tokens)) + ")"
         else:
             self.special_tokens = []
             self.split_pattern = None
+        self._split_re = re.compile(self.split_pattern) if self.split_pattern else None
 
-        self.merge_ranks: dict[tuple[bytes, bytes], int] = {
-            merge: i for i, merge in enumerate(merges)
-        }
         self.vocab_size = len(self.vocab)
         self.vocab_to_id = {v: k for k, v in self.vocab.items()}
-        
+        # ids are normally 0..vocab_size-1, so decode can index a flat list instead of
+        # hashing into the dict; fall back to the dict for sparse vocabularies
+        if all(i in self.vocab for i in range(self.vocab_size)):
+            self._vocab_arr: list[bytes] | dict[int, bytes] = [self.vocab[i] for i in range(self.vocab_size)]
+        else:
+            self._vocab_arr = self.vocab
+
+        # merges are keyed by the ids of their operands, so the merge loop hashes
+        # small ints and never concatenates bytes:
+        # left_id -> {right_id: (rank, new_id)}; most tokens start no merge at all,
+        # so one int probe rules a position out without building a pair tuple
+        self._merges_by_left: dict[int, dict[int, tuple[int, int]]] = {}
+        for i, (left, right) in enumerate(merges):
+            left_id = self.vocab_to_id.get(left)
+            right_id = self.vocab_to_id.get(right)
+            new_id = self.vocab_to_id.get(left + right)
+            if left_id is None or right_id is None or new_id is None:
+                continue
+            self._merges_by_left.setdefault(left_id, {})[right_id] = (i, new_id)
+        self._special_token_ids: dict[bytes, int] = {
+            token.encode("utf-8"): self.vocab_to_id[token.encode("utf-8")] for token in self.special_tokens
+        }
+        # id of each single-byte token, indexed by the byte value; None if the vocab lacks it
+        self._byte_ids: list[int | None] = [self.vocab_to_id.get(byte) for byte in BYTE_SINGLETONS]
+        # one of MERGE_BACKENDS; kept by name so unpickling rebuilds the same one
+        self.merge_backend: str = merge_backend or default_merge_backend()
+        self._init_merge_state()
+
+    def _init_merge_state(self):
+        """
+        Builds the merge loop and the per-thread pretoken caches, the two pieces of
+        state that are not pickled.
+        """
+        self._merge_ids = load_merge_backend(self.merge_backend)(self._merges_by_left).merge_word
+        # pretokens are Zipfian, so memoize the ids of the most recent ones; each
+        # thread gets its own cache so encode_iterable workers never share one
+        self._local = threading.local()
+
+    def __getstate__(self):
+        """
+        Drops the native merge table and the thread-local caches, neither of which
+        pickles, so the tokenizer can be sent to multiprocessing workers.
+        """
+        state = self.__dict__.copy()
+        del state["_merge_ids"], state["_local"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_merge_state()
     
     @classmethod
     def from_files(
         cls,
         vocab_filepath: str,
         merges_filepath: str,
-        special_tokens: list[str] | None = None
+        special_tokens: list[str] | None = None,
+        merge_backend: str | None = None,
     ) -> "Tokenizer":
         """ Class method that constructs and return a Tokenizer 
         from a serialized vocabulary and list of merges (in the 
@@ -113,87 +335,80 @@ class Tokenizer:
             vocab_filepath: Path to the serialized vocabulary file, json format.
             merges_filepath: Path to the serialized merges file, txt format.
             special_tokens: List of special tokens to include in the tokenizer.
+            merge_backend: One of MERGE_BACKENDS; defaults to the first one available.
         
         Returns:
             A Tokenizer instance.
         """
-        gpt2_byte_decoder = {v: k for k, v in gpt2_bytes_to_unicode().items()}
+        gpt2_byte_decoder = gpt2_unicode_to_bytes_table()
         with open(vocab_filepath) as vocab_f:
             gpt2_vocab = json.load(vocab_f)
-        gpt2_bpe_merges = []
-        with open(merges_filepath) as f:
-            for line in f:
-                cleaned_line = line.rstrip()
-                if cleaned_line and len(cleaned_line.split(" ")) == 2:
-                    gpt2_bpe_merges.append(tuple(cleaned_line.split(" ")))
         # The GPT-2 tokenizer uses a remapped unicode encoding for bytes. Let's
         # just return the original bytes, so we don't force students to use
         # any particular encoding scheme.
+        check_gpt2_unicode(gpt2_vocab)
         vocab = {
-            gpt2_vocab_index: bytes([gpt2_byte_decoder[token] for token in gpt2_vocab_item])
+            gpt2_vocab_index: gpt2_vocab_item.translate(gpt2_byte_decoder).encode("latin-1")
             for gpt2_vocab_item, gpt2_vocab_index in gpt2_vocab.items()
         }
+        gpt2_bpe_merges = []
+        with open(merges_filepath) as f:
+            for line in f:
+                # keep only lines with exactly one separating space
+                merge_token_1, sep, merge_token_2 = line.rstrip().partition(" ")
+                if sep and " " not in merge_token_2:
+                    gpt2_bpe_merges.append((merge_token_1, merge_token_2))
+        check_gpt2_unicode(token for merge in gpt2_bpe_merges for token in merge)
+        merges = [
+            (
+                merge_token_1.translate(gpt2_byte_decoder).encode("latin-1"),
+                merge_token_2.translate(gpt2_byte_decoder).encode("latin-1"),
+            )
+            for merge_token_1, merge_token_2 in gpt2_bpe_merges
+        ]
         # If any of the special tokens don't exist in the vocab, append them to the vocab.
         if special_tokens:
+            existing_tokens = set(vocab.values())
             for special_token in special_tokens:
                 byte_encoded_special_token = special_token.encode("utf-8")
-                if byte_encoded_special_token not in set(vocab.values()):
+                if byte_encoded_special_token not in existing_tokens:
                     vocab[len(vocab)] = byte_encoded_special_token
+                    existing_tokens.add(byte_encoded_special_token)
 
-        merges = [
-            (
-                bytes([gpt2_byte_decoder[token] for token in merge_token_1]),
-                bytes([gpt2_byte_decoder[token] for token in merge_token_2]),
-            )
-            for merge_token_1, merge_token_2 in gpt2_bpe_merges
-        ]
-        return cls(vocab, merges, special_tokens)
+        return cls(vocab, merges, special_tokens, merge_backend)
     
-    def pretokenize(self, text: str) -> Iterable[list[bytes]]:
+    def pretokenize(self, text: str) -> Iterable[bytes]:
         """
         Pretokenizes the text based on GPT-2 regex
-        returns dict {pretoken : freq}
+        yields the utf-8 bytes of each pretoken; special tokens are yielded whole
         """
-        if self.split_pattern:
-            text_chunks = re.split(self.split_pattern, text)
+        if self._split_re is not None:
+            text_chunks = self._split_re.split(text)
         else:
             text_chunks = [text]
         for chunk in text_chunks:
             if chunk in self.special_tokens:
-                yield [chunk.encode('utf-8')]
+                yield chunk.encode('utf-8')
             else:
-                pretokens = (
-                    match.group(0) 
-                    for match in re.finditer(PRETOKENIZE_REGEX, chunk)
-                )
-                for word in pretokens:
-                    yield [bytes([b]) for b in word.encode('utf-8')]
+                pretokenize_re = PRETOKENIZE_ASCII_RE if chunk.isascii() else PRETOKENIZE_RE
+                # findall builds the pretoken strings in C, skipping the Match objects
+                for word in pretokenize_re.findall(chunk):
+                    yield word.encode('utf-8')
 
-    def _merge_word(self, word: list[bytes]) -> list[int]:
+    def _thread_encode_pretoken(self):
         """
-        Merges the word into vocabulary tokens (no merges across pre-token boundaries)
-        Apply merges to our pre-tokens in the same order of creation.
+        Returns this thread's LRU-cached _encode_pretoken, creating it on first use.
+        The cache wraps a partial over the lookup tables rather than a bound method,
+        so it holds no reference back to the tokenizer.
         """
-        tokens = word[:]
-        while True:
-            pairs = get_pairs(tokens)
-            merge_candidates = [pair for pair in pairs if pair in self.merge_ranks]
-            if not merge_candidates:
-                break
-            best_pair = min(merge_candidates, key=lambda pair: self.merge_ranks[pair])
-            new_token = best_pair[0] + best_pair[1]
-            new_tokens = []
-            index = 0
-            while index < len(tokens):
-                if index + 1 < len(tokens) and (tokens[index], tokens[index + 1]) == best_pair:
-                    new_tokens.append(new_token)
-                    index += 2
-                else:
-                    new_tokens.append(tokens[index])
-                    index += 1
-            tokens = new_tokens
-        return [self.vocab_to_id[token] for token in tokens]
-        
+        encode_pretoken = getattr(self._local, "encode_pretoken", None)
+        if encode_pretoken is None:
+            encode_pretoken = lru_cache(maxsize=PRETOKEN_CACHE_SIZE)(
+                partial(_encode_pretoken, self._special_token_ids, self._byte_ids, self._merge_ids)
+            )
+            self._local.encode_pretoken = encode_pretoken
+        return encode_pretoken
+
     def encode(self, text: str) -> list[int]:
         """
         Steps:
@@ -203,16 +418,83 @@ class Tokenizer:
         Returns:
             A list of integer IDs corresponding to the vocabulary tokens in the text.
         """
-        word_iter = self.pretokenize(text)
-        
-        return sum((self._merge_word(word) for word in word_iter), [])
+        ids: list[int] = []
+        extend = ids.extend
+        encode_pretoken = self._thread_encode_pretoken()
+        for word in self.pretokenize(text):
+            extend(encode_pretoken(word))
+        return ids
+
+    def _encode_iter(self, text: str) -> Iterator[int]:
+        """
+        Yields the ids of text pretoken by pretoken, without building the full list.
+        """
+        encode_pretoken = self._thread_encode_pretoken()
+        for word in self.pretokenize(text):
+            yield from encode_pretoken(word)
     
-    def encode_iterable(self, iterable: Iterable[str]) -> list[int]:
-        return sum((self.encode(text) for text in iterable), [])
+    def encode_iterable(
+        self,
+        iterable: Iterable[str],
+        num_workers: int = 1,
+        batch_size: int = ENCODE_BATCH_SIZE,
+    ) -> Iterator[int]:
+        """
+        Lazily encodes each string of the iterable (e.g. the lines of a file handle),
+        so the ids of the whole corpus are never held in memory at once; wrap it in
+        `list(...)` if a list is needed.
+
+        By default the ids are streamed pretoken by pretoken on the calling thread.
+        With `num_workers` > 1, batches of `batch_size` strings are encoded on a pool
+        of that many threads and yielded in input order; only a few batches per worker
+        are in flight at a time, each buffered as a compact array of ids. This only
+        pays off with a native merge backend, which releases the GIL: regex
+        pretokenization and the pure-Python merge loop hold it, and each pool starts
+        with empty per-thread pretoken caches.
+        """
+        if num_workers <= 1:
+            for text in iterable:
+                yield from self._encode_iter(text)
+            return
+
+        iterator = iter(iterable)
+        with ThreadPoolExecutor(max_workers=num_workers) as pool:
+            pending = deque()
+            while batch := list(islice(iterator, batch_size)):
+                pending.append(pool.submit(self._encode_batch, batch))
+                if len(pending) >= 2 * num_workers:
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def _encode_batch(self, texts: list[str]) -> array:
+        """
+        Encodes a batch of strings on a worker thread, using that thread's pretoken
+        cache, and returns their concatenated ids as a compact array.
+        """
+        ids = array("i")
+        extend = ids.extend
+        encode_pretoken = self._thread_encode_pretoken()
+        for text in texts:
+            for word in self.pretokenize(text):
+                extend(encode_pretoken(word))
+        return ids
     
     def decode(self, ids: list[int]) -> str:
         """
         Notice:
             special handling for special tokens
         """    
-        return b"".join(self.vocab[id] for id in ids).decode("utf-8", errors="replace")
\ No newline at end of file
+        buffer = bytearray()
+        extend = buffer.extend
+        vocab = self._vocab_arr
+        # unknown ids raise KeyError whether vocab is the dense list or the dict;
+        # negative ids would otherwise index the list from the end
+        try:
+            for id in ids:
+                if id < 0:
+                    raise KeyError(id)
+                extend(vocab[id])
+        except IndexError:
+            raise KeyError(id) from None
+        return buffer.decode("utf-8", errors="replace")
\ No newline at end of file
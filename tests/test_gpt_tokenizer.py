@@ -0,0 +1,82 @@
+"""
+Tests of gpt.tokenizer.Tokenizer behaviour beyond the adapters interface.
+"""
+from __future__ import annotations
+
+import gc
+import json
+import pickle
+import weakref
+
+import pytest
+import tiktoken
+
+from gpt.tokenizer import MERGE_BACKENDS, Tokenizer, load_merge_backend
+
+from .common import FIXTURES_PATH
+
+VOCAB_PATH = FIXTURES_PATH / "gpt2_vocab.json"
+MERGES_PATH = FIXTURES_PATH / "gpt2_merges.txt"
+
+
+def test_pickle_roundtrip():
+    tokenizer = Tokenizer.from_files(VOCAB_PATH, MERGES_PATH, special_tokens=["<|endoftext|>"])
+    with open(FIXTURES_PATH / "tinystories_sample.txt") as f:
+        corpus_contents = f.read()
+    # encode first so the per-thread pretoken cache is populated when pickling
+    ids = tokenizer.encode(corpus_contents)
+    unpickled = pickle.loads(pickle.dumps(tokenizer))
+    assert unpickled.encode(corpus_contents) == ids
+    assert unpickled.decode(ids) == corpus_contents
+
+
+def test_tokenizer_freed_without_cyclic_gc():
+    tokenizer = Tokenizer.from_files(VOCAB_PATH, MERGES_PATH)
+    tokenizer.encode("the pretoken cache must not keep its tokenizer alive")
+    tokenizer_ref = weakref.ref(tokenizer)
+    gc.disable()
+    try:
+        del tokenizer
+        assert tokenizer_ref() is None
+    finally:
+        gc.enable()
+
+
+@pytest.mark.parametrize(
+    "vocab, merges, unmapped",
+    [({"a": 0, "\x01\x00": 1}, "", "\x01"), ({"a": 0, "b": 1}, "a b\u4e00\x00\n", "\u4e00")],
+    ids=["vocab", "merges"],
+)
+def test_from_files_rejects_unmapped_characters(tmp_path, vocab, merges, unmapped):
+    vocab_path = tmp_path / "vocab.json"
+    merges_path = tmp_path / "merges.txt"
+    vocab_path.write_text(json.dumps(vocab))
+    merges_path.write_text(merges)
+    with pytest.raises(KeyError) as excinfo:
+        Tokenizer.from_files(vocab_path, merges_path)
+    assert excinfo.value.args == (unmapped,)
+
+
+@pytest.mark.parametrize("merge_backend", MERGE_BACKENDS)
+def test_merge_backends_match_tiktoken(merge_backend):
+    try:
+        load_merge_backend(merge_backend)
+    except ImportError:
+        pytest.skip(f"the {merge_backend} merge backend is not available")
+    reference_tokenizer = tiktoken.get_encoding("gpt2")
+    tokenizer = Tokenizer.from_files(
+        VOCAB_PATH, MERGES_PATH, special_tokens=["<|endoftext|>"], merge_backend=merge_backend
+    )
+
+    test_strings = ["a" * 3000, " " + "x" * 2000, "ab" * 1500, "é" * 1000]
+    for fixture in ["address.txt", "german.txt", "tinystories_sample.txt", "corpus.en"]:
+        with open(FIXTURES_PATH / fixture) as f:
+            test_strings.append(f.read())
+    for test_string in test_strings:
+        reference_ids = reference_tokenizer.encode(test_string, allowed_special={"<|endoftext|>"})
+        assert tokenizer.encode(test_string) == reference_ids
+
+
+def test_unknown_merge_backend_raises():
+    with pytest.raises(ValueError):
+        Tokenizer.from_files(VOCAB_PATH, MERGES_PATH, merge_backend="rust")
@@ -380,6 +380,16 @@ def test_encode_special_token_double_newline_non_whitespace():
     assert reference_tokenizer.decode(reference_ids) == corpus_contents
 
 
+@pytest.mark.parametrize("bad_ids", [[-1], [0, 10**6]])
+def test_decode_unknown_id_raises(bad_ids):
+    tokenizer = get_tokenizer_from_vocab_merges_path(
+        vocab_path=VOCAB_PATH,
+        merges_path=MERGES_PATH,
+    )
+    with pytest.raises(KeyError):
+        tokenizer.decode(bad_ids)
+
+
 def test_encode_iterable_tinystories_sample_roundtrip():
     tokenizer = get_tokenizer_from_vocab_merges_path(
         vocab_path=VOCAB_PATH,
@@ -413,6 +423,18 @@ def test_encode_iterable_tinystories_matches_tiktoken():
     assert reference_tokenizer.decode(reference_ids) == corpus_contents
 
 
+def test_encode_iterable_thread_pool_matches_encode():
+    tokenizer = get_tokenizer_from_vocab_merges_path(
+        vocab_path=VOCAB_PATH, merges_path=MERGES_PATH, special_tokens=["<|endoftext|>"]
+    )
+    with open(FIXTURES_PATH / "tinystories_sample.txt") as f:
+        corpus_contents = f.read()
+    # a small batch size spreads the file over many batches and leaves a partial last one
+    with open(FIXTURES_PATH / "tinystories_sample.txt") as f:
+        ids = list(tokenizer.encode_iterable(f, num_workers=4, batch_size=7))
+    assert ids == tokenizer.encode(corpus_contents)
+
+
 @pytest.mark.skipif(
     not sys.platform.startswith("linux"),
     reason="rlimit support for non-linux systems is spotty.",